@@ -0,0 +1,246 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .base_client import _SET_PIXEL_PAYLOAD, BaseClient
+from .exceptions import HTTPError
+
+
+class AsyncClient(BaseClient):
+    """
+    Asynchronous counterpart of `Client`, built on an HTTP/2 `httpx.AsyncClient` so
+    that concurrent pixel writes are multiplexed on a single connection.
+    """
+
+    KEEPALIVE_EXPIRY = 600
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        username: str,
+        password: str,
+        raise_errors: bool = False,
+        retries: Optional[int] = None,
+        backoff_factor: Optional[float] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        headers: Optional[Dict] = None,
+        cache_token: bool = False,
+        refresh_margin: Optional[float] = None,
+    ):
+        """
+        :param client_id: The client_id used to authenticate to the API.
+        :param client_secret: The client_secret used to authenticate to the API.
+        :param username: Authenticated user's reddit username.
+        :param password: Authenticated user's reddit password.
+        :param raise_errors: Whether the client should raise on HTTPErrors or not.
+        :param retries: The max number of retries. None or 0 if disabled.
+        :param backoff_factor: Backoff factor for the wait and retry algorithm.
+                               Default: 0.3
+        :param client: The httpx client to use in the client.
+        :param headers: The default headers used for each requests.
+        :param cache_token: Whether the token should be stored in `TOKEN_CACHE_DIR`
+                            and reused by the next clients while it is valid.
+        :param refresh_margin: How many seconds before its expiration the token is
+                               refreshed. Default: 300
+        """
+        super().__init__(
+            client_id,
+            client_secret,
+            username,
+            password,
+            raise_errors=raise_errors,
+            headers=headers,
+            cache_token=cache_token,
+            refresh_margin=refresh_margin,
+        )
+
+        self._client = client
+        self.__send_with_retries = None
+        self.__init_client()
+        if retries:
+            self.__send_with_retries = self._with_retries(
+                self.__send_or_raise,
+                retries,
+                backoff_factor or self.DEFAULT_BACKOFF_FACTOR,
+                (httpx.TransportError,),
+            )
+
+        # Created lazily, to be bound to the running event loop.
+        self._token_lock = None
+
+    def __init_client(self):
+        """
+        Initiates the httpx client if it does not already exist.
+        """
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            http2=True, limits=httpx.Limits(keepalive_expiry=self.KEEPALIVE_EXPIRY)
+        )
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    # #
+    # # PROPERTIES
+    # #
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client
+
+    # #
+    # # PRIVATE METHODS
+    # #
+
+    async def __dispatch(
+        self, method: str, url: str, stream: bool = False, **kwargs
+    ) -> httpx.Response:
+        """
+        Sends the request through the httpx client. With `stream`, the response's
+        body is left unread, except for error responses: it is still loaded, for the
+        HTTPError and to close the stream.
+        """
+        if not stream:
+            return await self.client.request(method, url, **kwargs)
+        request = self.client.build_request(method, url, **kwargs)
+        resp = await self.client.send(request, stream=True)
+        if not 200 <= resp.status_code <= 299:
+            await resp.aread()
+        return resp
+
+    async def __send_or_raise(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Sends the request, raising the related HTTPError on retryable statuses.
+        """
+        resp = await self.__dispatch(method, url, **kwargs)
+        self._raise_for_retry(resp)
+        return resp
+
+    @staticmethod
+    async def __discard_body(resp: httpx.Response):
+        """
+        Discards the response's body, as `Client.write_pixel` does, without closing
+        the connection. Over HTTP/2, closing the stream only resets that stream. Over
+        HTTP/1.1 (e.g. if ALPN fell back to it) it would drop the connection, so the
+        body is downloaded first, still without being decoded.
+        """
+        if resp.http_version != "HTTP/2":
+            async for _ in resp.aiter_raw():
+                pass
+        await resp.aclose()
+
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Sends the request through the httpx client, with retries if enabled.
+
+        :param method: The method used make the request.
+        :param url: The url we want to make a request at.
+        :param kwargs: The arguments to pass to `client.request`, and `stream`.
+        :return: The request's response, the last one if the retries are exhausted.
+        """
+        if self.__send_with_retries is None:
+            return await self.__dispatch(method, url, **kwargs)
+        try:
+            return await self.__send_with_retries(method, url, **kwargs)
+        except HTTPError as error:
+            return error.response
+
+    async def _get_headers(self) -> Dict:
+        """
+        Token's infos are refreshed if it is expired. Concurrent calls wait for a
+        single refresh instead of each requesting a new token.
+
+        :return: The default headers.
+        """
+        headers = self._valid_auth_headers
+        if headers is None:
+            if self._token_lock is None:
+                self._token_lock = asyncio.Lock()
+            async with self._token_lock:
+                headers = self._valid_auth_headers
+                if headers is None:
+                    headers = await self._refresh__token_info()
+        return headers
+
+    async def _refresh__token_info(self) -> Dict:
+        """
+        Get a new token and update the client's token information.
+
+        :return: The default headers, for the new token.
+        :raise RefreshTokenError:
+        """
+        requested_at = time.time()
+        resp = await self._send("POST", self.AUTH_URL, **self._token_request_kwargs)
+        return self._update_token_info(resp, requested_at)
+
+    # #
+    # # METHODS
+    # #
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Make a prepared request with the client's credentials.
+
+        :param method: The method used make the request.
+        :param url: The url we want to make a request at.
+        :param kwargs: The arguments to pass to `client.request`.
+        :return: The request's response.
+        """
+        request_kwargs = self._with_headers(kwargs, await self._get_headers())
+        resp = await self._send(method, url, **request_kwargs)
+        if resp.status_code == 401:
+            # The token may have been revoked: retried once with a new one.
+            self._invalidate_token(request_kwargs["headers"]["Authorization"])
+            request_kwargs = self._with_headers(kwargs, await self._get_headers())
+            resp = await self._send(method, url, **request_kwargs)
+        self._raise_for_error(resp)
+        return resp
+
+    async def write_pixel(
+        self, x: int, y: int, color: int, return_body: bool = True
+    ) -> httpx.Response:
+        """
+
+        :param x: The pixel's x axis.
+        :param y: The pixel's y axis.
+        :param color: The color's code.
+        :param return_body: Whether the response's body should be loaded. When False,
+                            a successful response's body is discarded, while
+                            keeping the connection alive: only its status and
+                            headers are available.
+        :return: Request's response.
+        """
+        payload = _SET_PIXEL_PAYLOAD % (x, y, color)
+        resp = await self._request(
+            "POST", self.QUERY_URL, content=payload, stream=not return_body
+        )
+        if not return_body:
+            await self.__discard_body(resp)
+        return resp
+
+    async def write_pixels(
+        self, pixels: List[Tuple[int, int, int]], return_body: bool = True
+    ) -> List[httpx.Response]:
+        """
+        Writes the pixels concurrently.
+
+        :param pixels: The pixels to write, as (x, y, color) tuples.
+        :param return_body: Whether the responses' bodies should be loaded.
+        :return: Requests' responses, in the same order as the pixels.
+        """
+        return await asyncio.gather(
+            *(self.write_pixel(x, y, color, return_body) for x, y, color in pixels)
+        )
+
+    async def aclose(self):
+        """
+        Closes the underlying httpx client and its connections.
+        """
+        await self.client.aclose()
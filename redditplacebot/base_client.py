@@ -0,0 +1,390 @@
+import base64
+import email.utils
+import hashlib
+import os
+import re
+import tempfile
+import time
+from typing import Callable, Dict, Generator, Optional, Tuple, Type
+
+import backoff
+import orjson
+
+from .exceptions import HTTPError
+
+_SET_PIXEL_QUERY = "mutation setPixel($input: ActInput!) {\n  act(input: $input) {\n    data {\n      ... on BasicMessage {\n        id\n        data {\n          ... on GetUserCooldownResponseMessageData {\n            nextAvailablePixelTimestamp\n            __typename\n          }\n          ... on SetPixelResponseMessageData {\n            timestamp\n            __typename\n          }\n          __typename\n        }\n        __typename\n      }\n      __typename\n    }\n    __typename\n  }\n}\n"  # noqa
+
+# The setPixel payload only varies by the pixel's coordinates and color: it is
+# serialized once with a placeholder, which is then replaced by a bytes format
+# string taking `x`, `y` and `color`.
+_SET_PIXEL_PAYLOAD = (
+    orjson.dumps(
+        {
+            "operationName": "setPixel",
+            "variables": {
+                "input": {
+                    "actionName": "r/replace:set_pixel",
+                    "PixelMessageData": "__PIXEL_MESSAGE_DATA__",
+                }
+            },
+            "query": _SET_PIXEL_QUERY,
+        }
+    )
+    .replace(b"%", b"%%")
+    .replace(
+        b'"__PIXEL_MESSAGE_DATA__"',
+        b'{"coordinate":{"x":%d,"y":%d},"colorIndex":%d,"canvasIndex":0}',
+    )
+)
+
+
+_RETRY_AFTER_SECONDS_RE = re.compile(r"^\s*[0-9]+\s*$")
+
+
+def _get_retry_after(error: Exception) -> Optional[float]:
+    """
+    :param error: The error a request was retried on.
+    :return: How many seconds the Retry-After header of the error's response asks
+             to wait. None if it is missing or invalid.
+    """
+    if not isinstance(error, HTTPError):
+        return None
+    retry_after = error.response.headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    if _RETRY_AFTER_SECONDS_RE.match(retry_after):
+        return float(retry_after)
+    retry_date = email.utils.parsedate_tz(retry_after)
+    if retry_date is None:
+        return None
+    return max(email.utils.mktime_tz(retry_date) - time.time(), 0.0)
+
+
+def _retry_after_or_expo(factor: float, max_value: float) -> Generator:
+    """
+    backoff wait generator, sent the error of each failed try: waits as long as
+    its Retry-After header asks if any, else exponentially with full jitter.
+
+    :param factor: Backoff factor for the exponential waits.
+    :param max_value: The max exponential wait, before jitter.
+    """
+    expo = backoff.expo(factor=factor, max_value=max_value)
+    next(expo)
+    error = yield
+    while True:
+        # Advanced on every try, so that waits keep growing after a Retry-After.
+        wait = next(expo)
+        retry_after = _get_retry_after(error)
+        if retry_after is None:
+            retry_after = backoff.full_jitter(wait)
+        error = yield retry_after
+
+
+def _get_token_cache_path(cache_dir: str, client_id: str, username: str) -> str:
+    """
+    :param cache_dir: The directory of the token cache files.
+    :param client_id: The client_id used to authenticate to the API.
+    :param username: Authenticated user's reddit username.
+    :return: The path of the token cache file, unique per client and user.
+    """
+    key = hashlib.sha256((client_id + username).encode()).hexdigest()
+    return os.path.join(cache_dir, f"{key[:16]}.json")
+
+
+def _load_token_info(path: Optional[str]) -> Optional[Dict]:
+    """
+    Loads the token's infos from the cache file.
+
+    :param path: The path of the cache file. None if the cache is disabled.
+    :return: The cached token's infos. None if missing or unreadable.
+    """
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as file:
+            token_info = orjson.loads(file.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(token_info, dict) or not {
+        "access_token",
+        "token_type",
+        "expires_in",
+        "created_at",
+    }.issubset(token_info):
+        return None
+    return token_info
+
+
+def _store_token_info(path: Optional[str], token_info: Dict):
+    """
+    Atomically writes the token's infos to the cache file.
+    The file is only readable by its owner. Failures are ignored.
+
+    :param path: The path of the cache file. None if the cache is disabled.
+    :param token_info: The token's infos.
+    """
+    if path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(orjson.dumps(token_info))
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+def _delete_token_info(path: Optional[str]):
+    """
+    Deletes the token cache file. Failures are ignored.
+
+    :param path: The path of the cache file. None if the cache is disabled.
+    """
+    if path is None:
+        return
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class BaseClient:
+    """
+    Token, headers and retry policy shared by the sync and async clients. The
+    subclasses only implement the transport.
+    """
+
+    DEFAULT_BACKOFF_FACTOR = 0.3
+    DEFAULT_REFRESH_MARGIN = 300.0
+    # Rate limited or transient server errors, worth retrying after a backoff.
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    # Upper bounds, in seconds, of a single backoff wait and of all the retries.
+    MAX_BACKOFF = 30
+    MAX_RETRY_TIME = 60
+
+    AUTH_URL = "https://www.reddit.com/api/v1/access_token"
+    QUERY_URL = "https://gql-realtime-2.reddit.com/query"
+
+    TOKEN_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "redditplacebot")
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        username: str,
+        password: str,
+        raise_errors: bool = False,
+        headers: Optional[Dict] = None,
+        cache_token: bool = False,
+        refresh_margin: Optional[float] = None,
+    ):
+        """
+        :param client_id: The client_id used to authenticate to the API.
+        :param client_secret: The client_secret used to authenticate to the API.
+        :param username: Authenticated user's reddit username.
+        :param password: Authenticated user's reddit password.
+        :param raise_errors: Whether the client should raise on HTTPErrors or not.
+        :param headers: The default headers used for each requests.
+        :param cache_token: Whether the token should be stored in `TOKEN_CACHE_DIR`
+                            and reused by the next clients while it is valid.
+        :param refresh_margin: How many seconds before its expiration the token is
+                               refreshed. A wider margin costs a few early refreshes
+                               but avoids a token expiring mid-request because of
+                               clock skew or network latency, which would fail it.
+                               Default: 300
+        """
+        self._client_id = client_id
+        self._client_secret = client_secret
+        credentials = base64.b64encode(f"{client_id}:{client_secret}".encode())
+        self._basic_auth_header = f"Basic {credentials.decode()}"
+        self._username = username
+        self._password = password
+
+        self._raise_errors = raise_errors
+        self._refresh_margin = (
+            self.DEFAULT_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        )
+
+        self._token_cache_path = None
+        if cache_token:
+            self._token_cache_path = _get_token_cache_path(
+                self.TOKEN_CACHE_DIR, client_id, username
+            )
+
+        self.__headers = headers or {}
+        self.__headers["User-Agent"] = f"{username}/0.1"
+
+        # The token's infos and their default headers, always replaced together in a
+        # single assignment: threads reading them without the lock see either the
+        # previous pair or the next one, never a partly updated token.
+        self.__token = None
+        token_info = _load_token_info(self._token_cache_path)
+        if token_info is not None:
+            self.__set_token_info(token_info)
+
+    def _with_retries(
+        self,
+        send: Callable,
+        retries: int,
+        backoff_factor: float,
+        exceptions: Tuple[Type[Exception], ...],
+    ) -> Callable:
+        """
+        Wraps `send` to be retried with the given backoff factor. Rate limited or
+        unavailable responses are retried once their Retry-After header allows it.
+        Other waits are exponential with full jitter so that clients rate limited at
+        the same time do not retry at the same time.
+
+        :param send: The function sending a request, sync or async. It must raise
+                     on the statuses to retry, see `_raise_for_retry`.
+        :param retries: The max number of retries.
+        :param backoff_factor: Backoff factor for the wait and retry algorithm.
+        :param exceptions: The transport's connection errors to retry on.
+        :return: The wrapped function.
+        """
+        return backoff.on_exception(
+            _retry_after_or_expo,
+            (*exceptions, HTTPError),
+            max_tries=retries + 1,
+            max_time=self.MAX_RETRY_TIME,
+            jitter=None,
+            factor=backoff_factor,
+            max_value=self.MAX_BACKOFF,
+        )(send)
+
+    # #
+    # # PROPERTIES
+    # #
+
+    @property
+    def _valid_auth_headers(self) -> Optional[Dict]:
+        """
+        The headers are built once per token and must not be mutated. They are meant
+        for the GraphQL API, hence the JSON content type.
+
+        :return: The default headers, for the current token. None if the token is
+                 invalid (expired or non existing).
+        """
+        token = self.__token
+        if token is None:
+            return None
+        token_info, auth_headers = token
+        if (
+            time.time() + self._refresh_margin
+            < token_info["created_at"] + token_info["expires_in"]
+        ):
+            return auth_headers
+        return None
+
+    @property
+    def _token_request_kwargs(self) -> Dict:
+        """
+        :return: The arguments of the token request, besides method and url.
+        """
+        return {
+            "data": {
+                "username": self._username,
+                "password": self._password,
+                "grant_type": "password",
+            },
+            "headers": {**self.__headers, "Authorization": self._basic_auth_header},
+        }
+
+    # #
+    # # PRIVATE METHODS
+    # #
+
+    def __set_token_info(self, token_info: Dict) -> Dict:
+        """
+        Replaces the token's infos and their default headers at once.
+
+        :param token_info: The complete token's infos, `created_at` included.
+        :return: The default headers, for the new token.
+        """
+        token_type = token_info["token_type"]
+        token = token_info["access_token"]
+        auth_headers = {
+            "Authorization": f"{token_type} {token}",
+            "Content-Type": "application/json",
+            **self.__headers,
+        }
+        self.__token = (token_info, auth_headers)
+        return auth_headers
+
+    @staticmethod
+    def _with_headers(kwargs: Dict, auth_headers: Dict) -> Dict:
+        """
+        :param kwargs: The arguments of an authenticated request, left untouched.
+        :param auth_headers: The default headers to send.
+        :return: The arguments with the default headers. The caller's headers take
+                 precedence (e.g. its Content-Type), except for the Authorization.
+        """
+        headers = kwargs.get("headers")
+        if headers is None:
+            return {**kwargs, "headers": auth_headers}
+        return {
+            **kwargs,
+            "headers": {
+                **auth_headers,
+                **headers,
+                "Authorization": auth_headers["Authorization"],
+            },
+        }
+
+    def _invalidate_token(self, authorization: str):
+        """
+        Forgets the token, and deletes its cache file, if it is still the current
+        one. A token refused before its expiration has been revoked, e.g. after a
+        password change, and would otherwise be used until it expires.
+
+        :param authorization: The Authorization header sent with the refused token.
+        """
+        token = self.__token
+        if token is None or token[1]["Authorization"] != authorization:
+            return
+        self.__token = None
+        _delete_token_info(self._token_cache_path)
+
+    def _raise_for_retry(self, resp):
+        """
+        :param resp: The response of a request that may be retried.
+        :raise HTTPError: If the response's status is worth a retry.
+        """
+        if resp.status_code in self.RETRY_STATUSES:
+            raise HTTPError.related_exception(resp)
+
+    def _raise_for_error(self, resp):
+        """
+        :param resp: The response of an authenticated request.
+        :raise HTTPError: If the response errored and the client raises errors.
+        """
+        if self._raise_errors:
+            error = HTTPError.related_exception(resp)
+            if error is not None:
+                raise error
+
+    def _update_token_info(self, resp, requested_at: float) -> Dict:
+        """
+        Updates the client's token information from the token request's response.
+
+        :param resp: The token request's response.
+        :param requested_at: When the token was requested. Expiration is counted
+                             from then, not from when it was received.
+        :return: The default headers, for the new token.
+        :raise HTTPError: If the token request errored.
+        """
+        error = HTTPError.related_exception(resp)
+        if error is not None:
+            raise error
+        token_info = orjson.loads(resp.content)
+        token_info["created_at"] = requested_at
+        auth_headers = self.__set_token_info(token_info)
+        _store_token_info(self._token_cache_path, token_info)
+        return auth_headers
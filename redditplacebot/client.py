@@ -1,20 +1,28 @@
+import os
+import threading
 import time
-from typing import Dict, List, Optional
+from datetime import timedelta
+from typing import Dict, Optional
 
-import requests.auth
-from requests import Response, Session
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import requests
+import urllib3
+from requests import PreparedRequest, Response, Session
+from requests.adapters import DEFAULT_POOLSIZE
+from requests.structures import CaseInsensitiveDict
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, extract_zipped_paths, select_proxy
 
-from .colors import Color
+from .base_client import _SET_PIXEL_PAYLOAD, BaseClient
 from .exceptions import HTTPError
 
+# The only `session.request` arguments the urllib3 pool supports.
+_POOL_KWARGS = frozenset({"data", "headers", "stream"})
 
-class Client:
-    DEFAULT_BACKOFF_FACTOR = 0.3
 
-    AUTH_URL = "https://www.reddit.com/api/v1/access_token"
-    QUERY_URL = "https://gql-realtime-2.reddit.com/query"
+class Client(BaseClient):
+    # Connections kept alive by the pixel writes' pool, as many as requests'
+    # default adapter keeps per host: beyond that many concurrent writes, the
+    # extra connections are discarded once used.
+    POOL_MAXSIZE = DEFAULT_POOLSIZE
 
     def __init__(
         self,
@@ -27,6 +35,8 @@ class Client:
         backoff_factor: Optional[float] = None,
         session: Optional[Session] = None,
         headers: Optional[Dict] = None,
+        cache_token: bool = False,
+        refresh_margin: Optional[float] = None,
     ):
         """
         :param client_id: The client_id used to authenticate to the API.
@@ -37,56 +47,76 @@ class Client:
         :param retries: The max number of retries. None or 0 if disabled.
         :param backoff_factor: Backoff factor for the wait and retry algorithm.
                                Default: 0.3
-        :param session: The session to use in the client.
-                        When this is passed, `retries` and `backoff_factor` are ignored.
+        :param session: The session to use in the client. Pixel writes go through it
+                        rather than through the client's own urllib3 pool.
         :param headers: The default headers used for each requests.
+        :param cache_token: Whether the token should be stored in `TOKEN_CACHE_DIR`
+                            and reused by the next clients while it is valid.
+        :param refresh_margin: How many seconds before its expiration the token is
+                               refreshed. Default: 300
         """
-        self._client_id = client_id
-        self._client_secret = client_secret
-        self._username = username
-        self._password = password
-
-        self._raise_errors = raise_errors
+        super().__init__(
+            client_id,
+            client_secret,
+            username,
+            password,
+            raise_errors=raise_errors,
+            headers=headers,
+            cache_token=cache_token,
+            refresh_margin=refresh_margin,
+        )
 
         self._session = session
-        self.__init_session(retries, backoff_factor or self.DEFAULT_BACKOFF_FACTOR)
+        self._pool = None
+        self._pool_target = None
+        self.__send_with_retries = None
+        self.__init_session()
+        if retries:
+            self.__send_with_retries = self._with_retries(
+                self.__send_or_raise,
+                retries,
+                backoff_factor or self.DEFAULT_BACKOFF_FACTOR,
+                (requests.ConnectionError, requests.Timeout),
+            )
 
-        self.__token_info = None
-        self.__headers = headers or {}
-        self.__headers["User-Agent"] = f"{username}/0.1"
+        self._token_lock = threading.Lock()
 
-    def __init_session(self, retries: Optional[int], backoff_factor: float):
+    def __init_session(self):
         """
         Initiates the session if it does not already exist.
-
-        :param retries: The max number of retries. None or 0 if no retries.
-        :param backoff_factor: Backoff factor for the wait and retry algorithm.
-                               Default: 0.3
         """
         if self._session is not None:
             return
         self._session = Session()
-        if retries:
-            self.__init_retries(retries, backoff_factor)
+        self.__init_pool()
 
-    def __init_retries(self, retries: int, backoff_factor: float):
+    def __init_pool(self):
         """
-        Initiates the retries with the given backoff factor.
-
-        :param retries: The max number of retries.
-        :param backoff_factor: Backoff factor for the wait and retry algorithm.
-                               Default: 0.3
+        Initiates the urllib3 pool through which pixel writes skip requests, with the
+        CA bundle requests would use (e.g. from REQUESTS_CA_BUNDLE). Pixel writes
+        keep going through the session if they need a proxy or a client certificate.
         """
-        adapter = HTTPAdapter(
-            max_retries=Retry(
-                total=retries,
-                read=retries,
-                connect=retries,
-                backoff_factor=backoff_factor,
-            )
+        settings = self.session.merge_environment_settings(
+            self.QUERY_URL, {}, None, None, None
         )
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        if select_proxy(self.QUERY_URL, settings["proxies"]) or settings["cert"]:
+            return
+        query_url = urllib3.util.parse_url(self.QUERY_URL)
+        pool_kwargs = {}
+        if query_url.scheme == "https":
+            ca_bundle = settings["verify"]
+            if ca_bundle is True:
+                ca_bundle = extract_zipped_paths(DEFAULT_CA_BUNDLE_PATH)
+            pool_kwargs["cert_reqs"] = "CERT_REQUIRED"
+            if os.path.isdir(ca_bundle):
+                pool_kwargs["ca_cert_dir"] = ca_bundle
+            else:
+                pool_kwargs["ca_certs"] = ca_bundle
+        self._pool = urllib3.connection_from_url(
+            self.QUERY_URL, maxsize=self.POOL_MAXSIZE, block=False, **pool_kwargs
+        )
+        # Sent in origin form, as requests does, not as the absolute url.
+        self._pool_target = query_url.request_uri
 
     # #
     # # PROPERTIES
@@ -97,60 +127,128 @@ class Client:
         return self._session
 
     @property
-    def _is_valid_token(self) -> bool:
+    def _headers(self) -> Dict:
         """
-        :return: Whether the token is valid or not (expired or non existing == invalid).
+        Token's infos are refreshed if it is expired. Concurrent calls wait for a
+        single refresh instead of each requesting a new token.
+
+        :return: The default headers.
         """
-        if self.__token_info is None:
-            return False
-        return (
-            time.time() + 120
-            < self.__token_info["created_at"] + self.__token_info["expires_in"]
-        )
+        headers = self._valid_auth_headers
+        if headers is None:
+            with self._token_lock:
+                headers = self._valid_auth_headers
+                if headers is None:
+                    headers = self._refresh__token_info()
+        return headers
 
-    @property
-    def _token_info(self) -> Dict:
+    # #
+    # # PRIVATE METHODS
+    # #
+
+    def __pool_request(
+        self,
+        method: str,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict] = None,
+        stream: bool = False,
+    ) -> Response:
+        """
+        Sends the request through the urllib3 pool, raising the same connection
+        errors and returning the same response as requests would.
         """
-        Token's infos are refreshed if it is expired.
+        request = PreparedRequest()
+        request.method = method
+        request.url = self.QUERY_URL
+        request.headers = CaseInsensitiveDict(headers)
+        request.body = data
+        start = time.perf_counter()
+        try:
+            raw = self._pool.urlopen(
+                method,
+                self._pool_target,
+                body=data,
+                headers=headers,
+                retries=False,
+                redirect=False,
+                preload_content=False,
+                decode_content=False,
+            )
+        except urllib3.exceptions.NewConnectionError as error:
+            raise requests.ConnectionError(error, request=request)
+        except urllib3.exceptions.TimeoutError as error:
+            raise requests.Timeout(error, request=request)
+        except urllib3.exceptions.HTTPError as error:
+            raise requests.ConnectionError(error, request=request)
+        resp = self.session.get_adapter(self.QUERY_URL).build_response(request, raw)
+        resp.elapsed = timedelta(seconds=time.perf_counter() - start)
+        if not stream:
+            resp.content
+        return resp
 
-        :return: The token's infos.
+    def __dispatch(self, method: str, url: str, **kwargs) -> Response:
+        """
+        Sends pixel writes through the urllib3 pool if any, everything else through
+        the session, as well as requests with arguments the pool does not support.
+        The body of streamed error responses is still loaded, for the HTTPError and
+        to release the connection.
         """
-        if not self._is_valid_token:
-            self._refresh__token_info()
-        return self.__token_info
+        if (
+            self._pool is not None
+            and method == "POST"
+            and url == self.QUERY_URL
+            and _POOL_KWARGS.issuperset(kwargs)
+        ):
+            resp = self.__pool_request(method, **kwargs)
+        else:
+            resp = self.session.request(method, url, **kwargs)
+        if kwargs.get("stream") and not 200 <= resp.status_code <= 299:
+            resp.content
+        return resp
 
-    @property
-    def _headers(self) -> Dict:
+    def __send_or_raise(self, method: str, url: str, **kwargs) -> Response:
         """
-        :return: The default headers.
+        Sends the request, raising the related HTTPError on retryable statuses.
         """
-        token_type = self._token_info["token_type"]
-        token = self._token_info["access_token"]
-        return {"Authorization": f"{token_type} {token}", **self.__headers}
+        resp = self.__dispatch(method, url, **kwargs)
+        self._raise_for_retry(resp)
+        return resp
 
-    # #
-    # # PRIVATE METHODS
-    # #
+    def _send(self, method: str, url: str, **kwargs) -> Response:
+        """
+        Sends the request, with retries if enabled.
 
-    def _refresh__token_info(self):
+        :param method: The method used make the request.
+        :param url: The url we want to make a request at.
+        :param kwargs: The arguments to pass to `session.request`.
+        :return: The request's response, the last one if the retries are exhausted.
+        """
+        if self.__send_with_retries is None:
+            return self.__dispatch(method, url, **kwargs)
+        try:
+            return self.__send_with_retries(method, url, **kwargs)
+        except HTTPError as error:
+            return error.response
+
+    def _refresh__token_info(self) -> Dict:
         """
         Get a new token and update the client's token information.
 
+        :return: The default headers, for the new token.
         :raise RefreshTokenError:
         """
-        data = {
-            "username": self._username,
-            "password": self._password,
-            "grant_type": "password",
-        }
+        requested_at = time.time()
+        resp = self._send("POST", self.AUTH_URL, **self._token_request_kwargs)
+        return self._update_token_info(resp, requested_at)
 
-        auth = requests.auth.HTTPBasicAuth(self._client_id, self._client_secret)
+    def _invalidate_token(self, authorization: str):
+        """
+        Forgets the token, unless another thread is refreshing it.
 
-        resp = self.session.post(self.AUTH_URL, auth=auth, data=data, headers=self.__headers)
-        if HTTPError.related_exception(resp) is not None:
-            raise HTTPError.related_exception(resp)
-        self.__token_info = resp.json()
-        self.__token_info["created_at"] = time.time()
+        :param authorization: The Authorization header sent with the refused token.
+        """
+        with self._token_lock:
+            super()._invalidate_token(authorization)
 
     # #
     # # METHODS
@@ -165,35 +263,41 @@ class Client:
         :param kwargs: The arguments to pass to `session.request`.
         :return: The request's response.
         """
-        headers = kwargs.get("headers", dict())
-        headers.update(self._headers)
-        kwargs["headers"] = headers
-        resp = self.session.request(method, url, **kwargs)
-        if self._raise_errors and HTTPError.related_exception(resp) is not None:
-            raise HTTPError.related_exception(resp)
+        request_kwargs = self._with_headers(kwargs, self._headers)
+        resp = self._send(method, url, **request_kwargs)
+        if resp.status_code == 401:
+            # The token may have been revoked: retried once with a new one.
+            self._invalidate_token(request_kwargs["headers"]["Authorization"])
+            request_kwargs = self._with_headers(kwargs, self._headers)
+            resp = self._send(method, url, **request_kwargs)
+        self._raise_for_error(resp)
         return resp
 
-    def write_pixel(self, x: int, y: int, color: int):
+    def write_pixel(
+        self, x: int, y: int, color: int, return_body: bool = True
+    ) -> Response:
         """
 
         :param x: The pixel's x axis.
         :param y: The pixel's y axis.
         :param color: The color's code.
+        :param return_body: Whether the response's body should be loaded. When False,
+                            a successful response's body is still downloaded, to
+                            keep the connection alive, but discarded: only its
+                            status and headers are available.
         :return: Request's response.
         """
-        data = {
-            "operationName": "setPixel",
-            "variables": {
-                "input": {
-                    "actionName": "r/replace:set_pixel",
-                    "PixelMessageData": {
-                        "coordinate": {"x": x, "y": y},
-                        "colorIndex": color,
-                        "canvasIndex": 0,
-                    },
-                }
-            },
-            "query": "mutation setPixel($input: ActInput!) {\n  act(input: $input) {\n    data {\n      ... on BasicMessage {\n        id\n        data {\n          ... on GetUserCooldownResponseMessageData {\n            nextAvailablePixelTimestamp\n            __typename\n          }\n          ... on SetPixelResponseMessageData {\n            timestamp\n            __typename\n          }\n          __typename\n        }\n        __typename\n      }\n      __typename\n    }\n    __typename\n  }\n}\n",  # noqa
-        }
-
-        return self._request("POST", self.QUERY_URL, json=data)
+        payload = _SET_PIXEL_PAYLOAD % (x, y, color)
+        resp = self._request(
+            "POST", self.QUERY_URL, data=payload, stream=not return_body
+        )
+        if not return_body:
+            # Discarding the body rather than closing the connection keeps it alive.
+            # Raw responses not backed by urllib3 (e.g. from a custom adapter) are
+            # read instead.
+            drain_conn = getattr(resp.raw, "drain_conn", None)
+            if drain_conn is not None:
+                drain_conn()
+            else:
+                resp.content
+        return resp
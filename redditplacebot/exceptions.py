@@ -1,3 +1,5 @@
+from types import MappingProxyType
+
 from requests import Response
 
 __all__ = [
@@ -23,10 +25,17 @@ class HTTPError(Exception):
     An exception containing the response of a request to be inspected.
     """
 
+    __slots__ = ("response",)
+
     def __init__(self, response: Response):
-        super().__init__(f"{response.status_code}: {response.text}")
+        # Only the status code in `args`, for the repr: the body is decoded lazily.
+        super().__init__(response.status_code)
         self.response = response
 
+    def __str__(self) -> str:
+        # Built on demand: decoding the body is wasted on errors that are not shown.
+        return f"{self.response.status_code}: {self.response.text}"
+
     @classmethod
     def related_exception(cls, response: Response):
         """
@@ -36,73 +45,80 @@ class HTTPError(Exception):
         :param response: The errored response.
         :return: The related exception.
         """
-        if 200 <= response.status_code <= 299:
+        status_code = response.status_code
+        if 200 <= status_code <= 299:
             return None
-        error = HTTPErrorDict.get(response.status_code)
-        if error is None:
-            return cls(response)
-        return error(response)
+        error = None
+        if status_code < len(_HTTPErrorTable):
+            error = _HTTPErrorTable[status_code]
+        return (error or cls)(response)
 
 
 class HTTPBadRequestError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPAuthorizationError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPForbiddenError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPNotFoundError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPConflictError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPUnprocessableEntityError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPTooManyRequestError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPServerError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPNotImplementedError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPBadGatewayError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPServiceUnavailableError(HTTPError):
-    pass
+    __slots__ = ()
 
 
 class HTTPGatewayTimeoutError(HTTPError):
-    pass
-
-
-HTTPErrorDict = {
-    400: HTTPBadRequestError,
-    401: HTTPAuthorizationError,
-    403: HTTPForbiddenError,
-    404: HTTPNotFoundError,
-    409: HTTPConflictError,
-    422: HTTPUnprocessableEntityError,
-    429: HTTPTooManyRequestError,
-    500: HTTPServerError,
-    501: HTTPNotImplementedError,
-    502: HTTPBadGatewayError,
-    503: HTTPServiceUnavailableError,
-    504: HTTPGatewayTimeoutError,
-}
+    __slots__ = ()
+
+
+# Read-only: `_HTTPErrorTable` is built from it once, at import time.
+HTTPErrorDict = MappingProxyType(
+    {
+        400: HTTPBadRequestError,
+        401: HTTPAuthorizationError,
+        403: HTTPForbiddenError,
+        404: HTTPNotFoundError,
+        409: HTTPConflictError,
+        422: HTTPUnprocessableEntityError,
+        429: HTTPTooManyRequestError,
+        500: HTTPServerError,
+        501: HTTPNotImplementedError,
+        502: HTTPBadGatewayError,
+        503: HTTPServiceUnavailableError,
+        504: HTTPGatewayTimeoutError,
+    }
+)
+
+# Indexed by status code, so that the lookup is a single list access.
+_HTTPErrorTable = [HTTPErrorDict.get(status_code) for status_code in range(600)]
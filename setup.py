@@ -22,7 +22,12 @@ setup(
     version=__version__,
     packages=["redditplacebot"],
     install_requires=[
+        "backoff",
+        "orjson",
         "requests",
     ],
+    extras_require={
+        "async": ["httpx[http2]"],
+    },
     zip_safe=True,
 )
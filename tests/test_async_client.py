@@ -0,0 +1,174 @@
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+from redditplacebot.async_client import AsyncClient
+from redditplacebot.exceptions import HTTPForbiddenError
+
+TOKEN = {"access_token": "token", "token_type": "bearer", "expires_in": 3600}
+
+
+class Server:
+    """
+    Fake reddit API answering the token and setPixel requests.
+    """
+
+    def __init__(self, statuses=(), http_version="HTTP/1.1"):
+        self.statuses = list(statuses)
+        self.http_version = http_version
+        self.token_requests = []
+        self.pixel_requests = []
+        self.bodies_read = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url == AsyncClient.AUTH_URL:
+            self.token_requests.append(request)
+            # Lets concurrent writes pile up on the refresh.
+            await asyncio.sleep(0.01)
+            return self.response(200, TOKEN)
+        self.pixel_requests.append(request)
+        status = self.statuses.pop(0) if self.statuses else 200
+        return self.response(status, {"data": {}})
+
+    def response(self, status_code, body) -> httpx.Response:
+        async def stream():
+            # Unread until the client reads it, like a response from the network.
+            yield orjson.dumps(body)
+            self.bodies_read += 1
+
+        return httpx.Response(
+            status_code,
+            content=stream(),
+            extensions={"http_version": self.http_version.encode()},
+        )
+
+
+def make_client(server: Server, **kwargs) -> AsyncClient:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(server.handle))
+    return AsyncClient("id", "secret", "user", "password", client=client, **kwargs)
+
+
+def test_write_pixel():
+    server = Server()
+
+    async def run():
+        async with make_client(server) as client:
+            return await client.write_pixel(3, 4, 5)
+
+    resp = asyncio.run(run())
+
+    assert resp.status_code == 200
+    (token_request,) = server.token_requests
+    assert token_request.headers["Authorization"].startswith("Basic ")
+    (request,) = server.pixel_requests
+    assert request.headers["Authorization"] == "bearer token"
+    assert request.headers["Content-Type"] == "application/json"
+    pixel = orjson.loads(request.content)["variables"]["input"]["PixelMessageData"]
+    assert pixel == {"coordinate": {"x": 3, "y": 4}, "colorIndex": 5, "canvasIndex": 0}
+
+
+def test_write_pixels_refreshes_token_once():
+    server = Server()
+
+    async def run():
+        async with make_client(server) as client:
+            return await client.write_pixels([(0, 0, 1), (1, 0, 2), (2, 0, 3)])
+
+    resps = asyncio.run(run())
+
+    assert [resp.status_code for resp in resps] == [200, 200, 200]
+    assert len(server.token_requests) == 1
+    assert len(server.pixel_requests) == 3
+
+
+def test_write_pixel_retries():
+    server = Server(statuses=[503, 429])
+
+    async def run():
+        async with make_client(server, retries=2, backoff_factor=0.001) as client:
+            return await client.write_pixel(0, 0, 1)
+
+    assert asyncio.run(run()).status_code == 200
+    assert len(server.pixel_requests) == 3
+
+
+def test_write_pixel_returns_last_response_when_retries_exhausted():
+    server = Server(statuses=[503, 503])
+
+    async def run():
+        async with make_client(server, retries=1, backoff_factor=0.001) as client:
+            return await client.write_pixel(0, 0, 1)
+
+    assert asyncio.run(run()).status_code == 503
+
+
+def test_write_pixel_raise_errors():
+    server = Server(statuses=[403])
+
+    async def run():
+        async with make_client(server, raise_errors=True) as client:
+            await client.write_pixel(0, 0, 1)
+
+    with pytest.raises(HTTPForbiddenError):
+        asyncio.run(run())
+
+
+def test_write_pixel_refreshes_revoked_token():
+    server = Server(statuses=[401])
+
+    async def run():
+        async with make_client(server) as client:
+            return await client.write_pixel(0, 0, 1)
+
+    assert asyncio.run(run()).status_code == 200
+    assert len(server.token_requests) == 2
+    assert len(server.pixel_requests) == 2
+
+
+def test_write_pixel_without_body():
+    server = Server(statuses=[503])
+
+    async def run():
+        async with make_client(server, retries=1, backoff_factor=0.001) as client:
+            resp = await client.write_pixel(0, 0, 1, return_body=False)
+            return resp, resp.is_closed
+
+    resp, is_closed = asyncio.run(run())
+
+    assert resp.status_code == 200
+    assert is_closed
+    with pytest.raises(httpx.ResponseNotRead):
+        resp.content
+    assert len(server.pixel_requests) == 2
+    # Downloaded to keep the HTTP/1.1 connection alive: token, 503 and 200 bodies.
+    assert server.bodies_read == 3
+
+
+def test_write_pixel_without_body_resets_http2_stream():
+    server = Server(http_version="HTTP/2")
+
+    async def run():
+        async with make_client(server) as client:
+            resp = await client.write_pixel(0, 0, 1, return_body=False)
+            return resp, resp.is_closed
+
+    resp, is_closed = asyncio.run(run())
+
+    assert resp.status_code == 200
+    assert is_closed
+    # Only the token's body is read.
+    assert server.bodies_read == 1
+
+
+def test_write_pixel_without_body_loads_errors():
+    server = Server(statuses=[403])
+
+    async def run():
+        async with make_client(server, raise_errors=True) as client:
+            await client.write_pixel(0, 0, 1, return_body=False)
+
+    with pytest.raises(HTTPForbiddenError) as error:
+        asyncio.run(run())
+    assert orjson.loads(error.value.response.content) == {"data": {}}
@@ -0,0 +1,288 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from requests import Response
+
+from redditplacebot import base_client
+from redditplacebot.client import Client
+
+TOKEN = {"access_token": "token", "token_type": "bearer", "expires_in": 3600}
+
+
+class FakeSession:
+    """
+    Session answering the token and setPixel requests without any network.
+    Each token request issues a new access token, prefixed by `token`, and each
+    setPixel error response has the given Retry-After header if any.
+    """
+
+    def __init__(self, statuses=(), token="token", retry_after=None):
+        self.statuses = list(statuses)
+        self.token = token
+        self.retry_after = retry_after
+        self.token_requests = []
+        self.pixel_requests = []
+
+    def request(self, method, url, **kwargs):
+        if url == Client.AUTH_URL:
+            self.token_requests.append(kwargs)
+            token = f"{self.token}{len(self.token_requests)}"
+            return self.response(200, {**TOKEN, "access_token": token})
+        self.pixel_requests.append(kwargs)
+        status = self.statuses.pop(0) if self.statuses else 200
+        resp = self.response(status, {"data": {}})
+        if status != 200 and self.retry_after is not None:
+            resp.headers["Retry-After"] = self.retry_after
+        return resp
+
+    @staticmethod
+    def response(status_code, body):
+        resp = Response()
+        resp.status_code = status_code
+        resp._content = orjson.dumps(body)
+        return resp
+
+
+class SlowTokenSession(FakeSession):
+    """
+    FakeSession refusing its first token, as if it had been revoked, and slow to
+    issue tokens so that concurrent requests pile up on the refresh.
+    """
+
+    def request(self, method, url, **kwargs):
+        if url == Client.AUTH_URL:
+            time.sleep(0.05)
+        elif kwargs["headers"]["Authorization"] == f"bearer {self.token}1":
+            self.pixel_requests.append(kwargs)
+            return self.response(401, {"data": {}})
+        return super().request(method, url, **kwargs)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Client, "TOKEN_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def make_client(session, **kwargs):
+    return Client("id", "secret", "user", "password", session=session, **kwargs)
+
+
+def test_write_pixel():
+    session = FakeSession()
+    resp = make_client(session).write_pixel(3, 4, 5)
+
+    assert resp.status_code == 200
+    assert len(session.token_requests) == 1
+    (request,) = session.pixel_requests
+    assert request["headers"]["Authorization"] == "bearer token1"
+    payload = orjson.loads(request["data"])
+    pixel = payload["variables"]["input"]["PixelMessageData"]
+    assert pixel == {"coordinate": {"x": 3, "y": 4}, "colorIndex": 5, "canvasIndex": 0}
+
+
+def test_token_cache(cache_dir):
+    make_client(FakeSession(), cache_token=True).write_pixel(0, 0, 1)
+    (cache_file,) = cache_dir.iterdir()
+    assert cache_file.stat().st_mode & 0o777 == 0o600
+
+    session = FakeSession()
+    make_client(session, cache_token=True).write_pixel(0, 0, 1)
+    assert session.token_requests == []
+    assert session.pixel_requests[0]["headers"]["Authorization"] == "bearer token1"
+
+
+def test_revoked_token_is_refreshed_and_uncached(cache_dir):
+    make_client(FakeSession(token="old"), cache_token=True).write_pixel(0, 0, 1)
+
+    session = FakeSession(statuses=[401], token="new")
+    resp = make_client(session, cache_token=True).write_pixel(0, 0, 1)
+
+    assert resp.status_code == 200
+    assert len(session.token_requests) == 1
+    authorizations = [r["headers"]["Authorization"] for r in session.pixel_requests]
+    assert authorizations == ["bearer old1", "bearer new1"]
+    (cache_file,) = cache_dir.iterdir()
+    assert orjson.loads(cache_file.read_bytes())["access_token"] == "new1"
+
+
+def test_unauthorized_is_retried_once():
+    session = FakeSession(statuses=[401, 401])
+    resp = make_client(session).write_pixel(0, 0, 1)
+
+    assert resp.status_code == 401
+    assert len(session.token_requests) == 2
+    assert len(session.pixel_requests) == 2
+
+
+def test_store_failure_leaves_no_temporary_file(cache_dir, monkeypatch):
+    def fail(*args):
+        raise OSError
+
+    monkeypatch.setattr(os, "replace", fail)
+    make_client(FakeSession(), cache_token=True).write_pixel(0, 0, 1)
+
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_request_keeps_caller_headers():
+    session = FakeSession()
+    headers = {"Content-Type": "text/plain", "Authorization": "bearer forged"}
+
+    make_client(session)._request("POST", Client.QUERY_URL, data=b"", headers=headers)
+
+    (request,) = session.pixel_requests
+    assert request["headers"]["Content-Type"] == "text/plain"
+    assert request["headers"]["Authorization"] == "bearer token1"
+    assert headers == {"Content-Type": "text/plain", "Authorization": "bearer forged"}
+
+
+def test_write_pixel_retries_with_custom_session(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    session = FakeSession(statuses=[503, 503])
+
+    resp = make_client(session, retries=2, backoff_factor=100).write_pixel(0, 0, 1)
+
+    assert resp.status_code == 200
+    assert len(session.pixel_requests) == 3
+    # Full jitter waits anywhere up to the capped exponential wait.
+    assert len(sleeps) == 2
+    assert all(0 <= sleep <= Client.MAX_BACKOFF for sleep in sleeps)
+
+
+def test_write_pixel_retries_after_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    session = FakeSession(statuses=[429, 429], retry_after="7")
+
+    resp = make_client(session, retries=2, backoff_factor=0.001).write_pixel(0, 0, 1)
+
+    assert resp.status_code == 200
+    assert sleeps == [7.0, 7.0]
+
+
+class SlowDict(dict):
+    def __setitem__(self, key, value):
+        # Widens the window in which a token being updated could be seen.
+        time.sleep(0.01)
+        super().__setitem__(key, value)
+
+
+def test_concurrent_writes_share_token_refreshes(monkeypatch):
+    monkeypatch.setattr(
+        base_client,
+        "orjson",
+        SimpleNamespace(
+            loads=lambda content: SlowDict(orjson.loads(content)), dumps=orjson.dumps
+        ),
+    )
+    session = SlowTokenSession()
+    client = make_client(session)
+
+    def write_pixel(i):
+        # Staggered, so that some writes start while the token is being updated.
+        time.sleep(i * 0.005)
+        return client.write_pixel(i, 0, 1)
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        statuses = [resp.status_code for resp in executor.map(write_pixel, range(32))]
+
+    assert statuses == [200] * 32
+    # One refresh for the first token, one once it has been refused.
+    assert len(session.token_requests) == 2
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Records the request lines it receives and answers every request successfully.
+    """
+
+    protocol_version = "HTTP/1.1"
+    request_lines = []
+
+    def do_POST(self):
+        self.request_lines.append(self.requestline)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = orjson.dumps(TOKEN if self.path == "/token" else {"data": {}})
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_client_class():
+    """
+    A Client class pointing at a local HTTP server, through which it writes pixels
+    with its urllib3 pool.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    Handler.request_lines = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    class LocalClient(Client):
+        AUTH_URL = f"{base_url}/token"
+        QUERY_URL = f"{base_url}/query"
+
+    yield LocalClient
+    server.shutdown()
+    server.server_close()
+
+
+def test_pool_sends_origin_form(local_client_class):
+    client = local_client_class("id", "secret", "user", "password")
+    assert client._pool is not None
+
+    assert client.write_pixel(0, 0, 1).status_code == 200
+    assert Handler.request_lines == ["POST /token HTTP/1.1", "POST /query HTTP/1.1"]
+
+
+def test_pool_returns_requests_responses(local_client_class):
+    client = local_client_class("id", "secret", "user", "password")
+
+    resp = client.write_pixel(0, 0, 1)
+
+    assert isinstance(resp, Response)
+    assert resp.url == client.QUERY_URL
+    assert resp.request.headers["Authorization"] == "bearer token"
+    assert resp.json() == {"data": {}}
+    resp.raise_for_status()
+
+
+def test_pool_falls_back_to_session_on_unsupported_arguments(local_client_class):
+    client = local_client_class("id", "secret", "user", "password")
+
+    resp = client._request("POST", client.QUERY_URL, data=b"{}", timeout=5)
+
+    assert isinstance(resp, Response)
+    assert resp.status_code == 200
+
+
+def test_pool_uses_requests_ca_bundle(tmp_path, monkeypatch):
+    ca_bundle = tmp_path / "ca.pem"
+    ca_bundle.write_text("")
+    monkeypatch.setenv("REQUESTS_CA_BUNDLE", str(ca_bundle))
+
+    client = Client("id", "secret", "user", "password")
+
+    assert client._pool.ca_certs == str(ca_bundle)
+
+
+def test_write_pixel_without_body_from_custom_adapter():
+    # Responses without a urllib3 raw response are read rather than drained.
+    resp = make_client(FakeSession()).write_pixel(0, 0, 1, return_body=False)
+
+    assert resp.status_code == 200